@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3
+
+from libc.math cimport sqrt
+
+from cython.parallel import prange
+
+cimport numpy as np
+cimport cython
+from numpy.math cimport INFINITY
+
+import numpy as np
+
+
+@cython.boundscheck(False)
+@cython.cdivision(True)
+@cython.wraparound(False)
+cpdef stomp_parallel(double[:] ts, double[:] query, int w, int exclusion_zone,
+    int is_join, double[:] data_mu, double[:] data_sig,
+    double[:] first_column, double[:, :] products,
+    np.uint8_t[:] skip_locs, np.int64_t[:] batch_starts,
+    np.int64_t[:] batch_ends, int n_jobs):
+    """
+    Computes the STOMP matrix profile batches in parallel using shared memory.
+    Each batch is handled by a single thread that keeps its own sliding dot
+    product and matrix profiles, so no data is copied between workers.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series to compute the matrix profile for.
+    query : array_like
+        The query.
+    w : int
+        The window size.
+    exclusion_zone : int
+        Used to exclude trivial matches.
+    is_join : int
+        Flag (0, 1) to indicate if an AB join or self join is occuring.
+    data_mu : array_like
+        The moving average over the time series.
+    data_sig : array_like
+        The moving standard deviation over the time series.
+    first_column : array_like
+        The dot product of the first window of the time series with every
+        window of the query.
+    products : array_like
+        The sliding dot product preceding each batch, one row per batch. The
+        rows are used as scratch space and are overwritten.
+    skip_locs : array_like
+        Flags (0, 1) for the query windows that should be skipped due to nan
+        or inf.
+    batch_starts : array_like
+        The starting index of each batch.
+    batch_ends : array_like
+        The exclusive ending index of each batch.
+    n_jobs : int
+        Number of cpu cores to use.
+
+    Returns
+    -------
+    (array_like, array_like, array_like, array_like, array_like, array_like) :
+        The per batch (mp, pi, lmp, lpi, rmp, rpi) with one row per batch.
+
+    """
+    cdef Py_ssize_t b, i, j, start, end, ez_start, ez_end
+    cdef Py_ssize_t n_batches = batch_starts.shape[0]
+    cdef Py_ssize_t profile_len = ts.shape[0] - w + 1
+    cdef double query_sum, query_2sum, query_mu, query_sig2, query_sig
+    cdef double drop_value, new_value, dist
+
+    cdef double[:, :] mp = np.full((n_batches, profile_len), np.inf, dtype='d')
+    cdef Py_ssize_t[:, :] pi = np.zeros((n_batches, profile_len), dtype=np.intp)
+    cdef double[:, :] lmp = np.full((n_batches, profile_len), np.inf, dtype='d')
+    cdef Py_ssize_t[:, :] lpi = np.zeros((n_batches, profile_len), dtype=np.intp)
+    cdef double[:, :] rmp = np.full((n_batches, profile_len), np.inf, dtype='d')
+    cdef Py_ssize_t[:, :] rpi = np.zeros((n_batches, profile_len), dtype=np.intp)
+
+    for b in prange(n_batches, num_threads=n_jobs, nogil=True, schedule='static',
+        chunksize=1):
+        start = batch_starts[b]
+        end = batch_ends[b]
+
+        # the first batch starts from the precomputed first product, the
+        # others are rolled forward from the window preceding the batch
+        query_sum = 0
+        query_2sum = 0
+        if start == 0:
+            for j in range(w):
+                query_sum = query_sum + query[j]
+                query_2sum = query_2sum + query[j] * query[j]
+            drop_value = query[0]
+        else:
+            for j in range(start - 1, start - 1 + w):
+                query_sum = query_sum + query[j]
+                query_2sum = query_2sum + query[j] * query[j]
+            drop_value = query[start - 1]
+
+        # only compute the distance profile for index 0 and update
+        if start == 0:
+            query_mu = query_sum / w
+            query_sig2 = query_2sum / w - query_mu * query_mu
+            if query_sig2 < 0:
+                query_sig = 0
+            else:
+                query_sig = sqrt(query_sig2)
+
+            ez_start = 0
+            ez_end = 0
+            if exclusion_zone > 0 and not is_join:
+                ez_end = exclusion_zone + 1
+                if ez_end > profile_len:
+                    ez_end = profile_len
+
+            for j in range(profile_len):
+                if j >= ez_start and j < ez_end:
+                    dist = INFINITY
+                else:
+                    dist = sqrt(2 * (w - (products[b, j]
+                        - w * data_mu[j] * query_mu)
+                        / (data_sig[j] * query_sig)))
+
+                if dist < mp[b, j]:
+                    mp[b, j] = dist
+                    pi[b, j] = 0
+
+                    if not is_join:
+                        lmp[b, j] = dist
+                        lpi[b, j] = 0
+
+            start = 1
+
+        # iteratively compute distance profile and update with element-wise
+        # mins
+        for i in range(start, end):
+            # check for nan or inf and skip
+            if skip_locs[i]:
+                continue
+
+            new_value = query[i + w - 1]
+            query_sum = query_sum - drop_value + new_value
+            query_2sum = query_2sum - drop_value * drop_value \
+                + new_value * new_value
+            query_mu = query_sum / w
+            query_sig2 = query_2sum / w - query_mu * query_mu
+            query_sig = sqrt(query_sig2)
+
+            # roll the sliding dot product in place from the back
+            for j in range(profile_len - 1, 0, -1):
+                products[b, j] = products[b, j - 1] \
+                    - ts[j - 1] * drop_value \
+                    + ts[j + w - 1] * new_value
+            products[b, 0] = first_column[i]
+            drop_value = query[i]
+
+            ez_start = 0
+            ez_end = 0
+            if exclusion_zone > 0 and not is_join:
+                ez_start = i - exclusion_zone
+                if ez_start < 0:
+                    ez_start = 0
+                ez_end = i + exclusion_zone + 1
+                if ez_end > profile_len:
+                    ez_end = profile_len
+
+            for j in range(profile_len):
+                if j >= ez_start and j < ez_end:
+                    dist = INFINITY
+                else:
+                    dist = sqrt(2 * (w - (products[b, j]
+                        - w * data_mu[j] * query_mu)
+                        / (data_sig[j] * query_sig)))
+
+                # update the matrix profile
+                if dist < mp[b, j]:
+                    mp[b, j] = dist
+                    pi[b, j] = i
+
+                # update the left and right matrix profiles
+                if not is_join:
+                    if j >= i:
+                        if dist < lmp[b, j]:
+                            lmp[b, j] = dist
+                            lpi[b, j] = i
+                    elif dist < rmp[b, j]:
+                        rmp[b, j] = dist
+                        rpi[b, j] = i
+
+    return (
+        np.asarray(mp), np.asarray(pi), np.asarray(lmp), np.asarray(lpi),
+        np.asarray(rmp), np.asarray(rpi)
+    )
@@ -80,8 +80,8 @@ def statistics(ts, window_size):
         'mean': np.mean(ts),
         'std': np.std(ts),
         'median': np.median(ts),
-        'moving_min': np.min(rolling_ts, axis=1),
-        'moving_max': np.max(rolling_ts, axis=1),
+        'moving_min': core.moving_min(ts, window_size),
+        'moving_max': core.moving_max(ts, window_size),
         'moving_mean': moving_mu,
         'moving_std': moving_sigma,
         'moving_median': np.median(rolling_ts, axis=1),
@@ -1,44 +1,45 @@
 # -*- coding: utf-8 -*-
-from __future__ import absolute_import
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-range = getattr(__builtins__, 'xrange', range)
-# end of py2 compatability boilerplate
-
+import functools
 import logging
 import math
 import multiprocessing
-import sys
 
 import numpy as np
+import scipy.fft
+
+try:
+    import numexpr as ne
+except ImportError:
+    ne = None
 
 from matrixprofile import cycore
 
 logger = logging.getLogger(__name__)
 
+# query length at which the FFT convolution outperforms direct convolution
+FFT_CONVOLVE_MIN_QUERY_LENGTH = 512
+
+# largest transform length whose query spectrum is cached, bounding each
+# cached spectrum to about 512 KiB
+FFT_CACHE_MAX_LENGTH = 2 ** 16
+
 
 def mp_pool():
     """
-    Utility function to get the appropriate multiprocessing
-    handler for Python 2 and 3.
-    """
-    ctxt = None
-    if sys.version_info[0] == 2:
-        from contextlib import contextmanager
+    Utility function to get the multiprocessing pool handler.
 
-        @contextmanager
-        def multiprocessing_context(*args, **kwargs):
-            pool = multiprocessing.Pool(*args, **kwargs)
-            yield pool
-            pool.terminate()
+    The pool pickles its arguments for every worker, so it is reserved for
+    heavyweight independent tasks such as pairwise_dist. Numeric kernels
+    should instead be written in Cython with OpenMP's prange over shared
+    memory, as in cympx and cystomp.
 
-        ctxt = multiprocessing_context
-    else:
-        ctxt = multiprocessing.Pool
-
-    return ctxt
+    To migrate an algorithm off the pool, compute the batch bounds with
+    generate_batch_jobs_array and pass them to a Cython kernel that runs
+    prange over the batches with per batch scratch rows, as stomp does with
+    cystomp.stomp_parallel. prange only runs in compiled code, so there is
+    no Python level parallel range helper.
+    """
+    return multiprocessing.Pool
 
 
 def is_array_like(a):
@@ -72,7 +73,7 @@ def is_similarity_join(ts_a, ts_b):
     -------
     True or false respectively.
     """
-    return is_array_like(ts_a) and is_array_like(ts_b)
+    return ts_b is not None and is_array_like(ts_a) and is_array_like(ts_b)
 
 
 def to_np_array(a):
@@ -97,9 +98,9 @@ def to_np_array(a):
         return a
 
     if not is_array_like(a):
-        raise ValueError('Unable to convert to np.ndarray!')    
+        raise ValueError('Unable to convert to np.ndarray!')
 
-    return np.array(a)
+    return np.asarray(a)
 
 
 def is_one_dimensional(a):
@@ -153,19 +154,12 @@ def find_skip_locations(ts, profile_length, window_size):
     
     Returns
     -------
-    int - the length of the matrix profile.
+    np.ndarray - boolean mask of the locations to skip.
     """
-    skip_loc = np.zeros(profile_length).astype(bool)
+    ts = np.asarray(ts, dtype='d')
+
+    return cycore.find_skip_locations(ts, profile_length, window_size)
 
-    for i in range(profile_length):
-        segment = ts[i:i + window_size]
-        search = (np.isinf(segment) | np.isnan(segment))
-        
-        if np.any(search):
-            skip_loc[i] = True
-        
-    return skip_loc
-    
 
 def clean_nan_inf(ts):
     """
@@ -186,8 +180,12 @@ def clean_nan_inf(ts):
         When the ts is not array like.
     """
     ts = to_np_array(ts)
-    search = (np.isinf(ts) | np.isnan(ts))
-    ts[search] = 0
+
+    if ts.dtype == 'd' and ts.ndim == 1 and ts.flags.writeable:
+        cycore.clean_nan_inf(ts)
+    else:
+        search = (np.isinf(ts) | np.isnan(ts))
+        ts[search] = 0
 
     return ts
 
@@ -293,8 +291,18 @@ def moving_average(a, window=3):
     Returns
     -------
     The moving average over the array.
+
+    Notes
+    -----
+    The average is taken from a compensated rolling sum in linear time.
+    Use moving_avg_std when both statistics are needed. Arrays that are
+    not one dimensional are averaged over the last axis of rolling_window.
     """
-    return np.mean(rolling_window(a, window), -1)
+    a = np.asarray(a)
+    if a.ndim != 1:
+        return np.mean(rolling_window(a, window), -1)
+
+    return np.asarray(cycore.moving_mean(np.asarray(a, dtype='d'), window))
 
 
 def moving_std(a, window=3):
@@ -311,8 +319,20 @@ def moving_std(a, window=3):
     Returns
     -------
     The moving std. over the array.
+
+    Notes
+    -----
+    The std. is taken from a rolling form of Welford's method.
+    Use moving_avg_std when both statistics are needed. Arrays that are
+    not one dimensional are reduced over the last axis of rolling_window.
     """
-    return np.std(rolling_window(a, window), -1)
+    a = np.asarray(a)
+    if a.ndim != 1:
+        return np.std(rolling_window(a, window), -1)
+
+    mu, sig = cycore.moving_avg_std_welford(np.asarray(a, dtype='d'), window)
+
+    return np.asarray(sig)
 
 
 def moving_avg_std(a, window=3):
@@ -337,6 +357,27 @@ def moving_avg_std(a, window=3):
     return (np.asarray(mu), np.asarray(sig))
 
 
+def _is_exact_in_double(dtype):
+    """
+    Helper function to determine if every value of a dtype is exactly
+    representable as a double, so it survives the round trip through the
+    double precision kernels.
+
+    Parameters
+    ----------
+    dtype : np.dtype
+        The dtype to test.
+
+    Returns
+    -------
+    True or false respectively.
+    """
+    if dtype.kind in 'iu':
+        return dtype.itemsize <= 4
+
+    return dtype.kind == 'b' or (dtype.kind == 'f' and dtype.itemsize <= 8)
+
+
 def moving_min(a, window=3):
     """
     Computes the moving minimum over an array given a window size.
@@ -353,7 +394,13 @@ def moving_min(a, window=3):
     array_like :
         The array of moving minimums.
     """
-    return np.min(rolling_window(a, window), axis=1)
+    a = np.asarray(a)
+    if a.ndim != 1 or not _is_exact_in_double(a.dtype):
+        return np.min(rolling_window(a, window), axis=1)
+
+    moving = cycore.moving_min(np.asarray(a, dtype='d'), window)
+
+    return np.asarray(moving).astype(a.dtype, copy=False)
 
 
 def moving_max(a, window=3):
@@ -372,7 +419,13 @@ def moving_max(a, window=3):
     array_like :
         The array of moving maximums.
     """
-    return np.max(rolling_window(a, window), axis=1)
+    a = np.asarray(a)
+    if a.ndim != 1 or not _is_exact_in_double(a.dtype):
+        return np.max(rolling_window(a, window), axis=1)
+
+    moving = cycore.moving_max(np.asarray(a, dtype='d'), window)
+
+    return np.asarray(moving).astype(a.dtype, copy=False)
 
 
 def moving_median(a, window=3):
@@ -394,11 +447,44 @@ def moving_median(a, window=3):
     return np.median(rolling_window(a, window), axis=1)
 
 
+@functools.lru_cache(maxsize=8)
+def _fft_reversed_query(query_bytes, dtype, n):
+    """
+    Computes the real FFT of the reversed query zero padded to n. The result
+    is cached as iterative algorithms convolve the same query repeatedly.
+    Only transforms up to FFT_CACHE_MAX_LENGTH are cached so the cache stays
+    within a few megabytes.
+
+    Parameters
+    ----------
+    query_bytes : bytes
+        The raw bytes of the query.
+    dtype : str
+        The dtype of the query.
+    n : int
+        The length of the transform.
+
+    Returns
+    -------
+    array_like - The read-only spectrum of the reversed query.
+    """
+    query = np.frombuffer(query_bytes, dtype=dtype)
+    y = scipy.fft.rfft(np.flipud(query), n=n)
+    y.setflags(write=False)
+
+    return y
+
+
 def fft_convolve(ts, query):
     """
     Computes the sliding dot product for query over the time series using
     the quicker FFT convolution approach.
 
+    The transforms are padded to a fast length for pocketfft, whose plans are
+    cached across calls of the same length. Single precision inputs are
+    transformed in single precision. Complex inputs use the full complex
+    transform and the real part of the product is returned.
+
     Parameters
     ----------
     ts : array_like
@@ -412,19 +498,36 @@ def fft_convolve(ts, query):
     """
     n = len(ts)
     m = len(query)
-    x = np.fft.fft(ts)
-    y = np.append(np.flipud(query), np.zeros([1, n - m]))
-    y = np.fft.fft(y)
-    z = np.fft.ifft(x * y)
+    query = np.asarray(query)
 
-    return np.real(z[m - 1:n])
+    if np.iscomplexobj(ts) or np.iscomplexobj(query):
+        n_fft = scipy.fft.next_fast_len(n)
+        x = scipy.fft.fft(ts, n=n_fft)
+        y = scipy.fft.fft(np.flipud(query), n=n_fft)
+        z = scipy.fft.ifft(x * y)
+
+        return np.real(z[m - 1:n])
+
+    # any length >= n keeps the circular wrap around out of the valid range
+    n_fft = scipy.fft.next_fast_len(n, real=True)
+    x = scipy.fft.rfft(ts, n=n_fft)
+    if n_fft <= FFT_CACHE_MAX_LENGTH:
+        y = _fft_reversed_query(query.tobytes(), query.dtype.str, n_fft)
+    else:
+        y = scipy.fft.rfft(np.flipud(query), n=n_fft)
+    z = scipy.fft.irfft(x * y, n=n_fft)
+
+    return z[m - 1:n]
 
 
 def sliding_dot_product(ts, query):
     """
     Computes the sliding dot product for query over the time series using
-    convolution. Note that the result is trimmed due to the computations
-    being invalid; the len(query) to len(ts) is kept.
+    correlation. Only the positions where the query fully overlaps the time
+    series are computed; the len(query) to len(ts) is kept.
+
+    Long queries are delegated to fft_convolve as the direct convolution
+    cost grows with len(ts) * len(query).
 
     Parameters
     ----------
@@ -437,14 +540,18 @@ def sliding_dot_product(ts, query):
     -------
     array_like - The sliding dot product.
     """
-    m = len(query)
-    n = len(ts)
-    dp = np.convolve(ts, np.flipud(query), mode='full')
+    # no position fully overlaps, np.correlate would swap the arguments
+    if len(query) > len(ts):
+        return np.empty(0, dtype='d')
+
+    if len(query) >= FFT_CONVOLVE_MIN_QUERY_LENGTH:
+        return fft_convolve(ts, query)
 
-    return np.real(dp[m - 1:n])
+    return np.correlate(ts, query, mode='valid')
 
 
-def distance_profile(prod, ws, data_mu, data_sig, query_mu, query_sig):
+def distance_profile(prod, ws, data_mu, data_sig, query_mu, query_sig,
+    dtype=None, out=None):
     """
     Computes the distance profile for the given statistics.
 
@@ -462,20 +569,79 @@ def distance_profile(prod, ws, data_mu, data_sig, query_mu, query_sig):
         The querys moving average.
     query_sig : array_like
         The querys moving standard deviation.
+    dtype : np.dtype, Default = None
+        Optionally, the floating point type to compute the distances in. The
+        inputs are promoted as usual by default. np.float32 halves the memory
+        traffic and doubles the SIMD width at the cost of precision; it keeps
+        about 7 significant digits, which is usually enough to rank
+        z-normalized distances.
+    out : array_like, Default = None
+        Optionally, a preallocated array of the same length as prod to write
+        the distance profile into. Reusing it across calls avoids allocating
+        a new array per distance profile.
 
 
     Returns
     -------
     array_like - The distance profile.
-    """
-    distance_profile = (
-        2 * (ws - (prod - ws * data_mu * query_mu) / (data_sig * query_sig))
-    )
+
+    Notes
+    -----
+    When numexpr is installed the expression is evaluated in a single
+    multi-threaded pass without intermediate arrays. numexpr builds linked
+    against MKL additionally use VML's vectorized sqrt; its accuracy mode is
+    left at numexpr's default as it is process wide state.
+    """
+    # the cycore statistics are memoryviews, which are converted so that
+    # their dtype can be resolved
+    prod = np.asarray(np.real(np.asarray(prod)), dtype=dtype)
+    data_mu = np.asarray(data_mu, dtype=dtype)
+    data_sig = np.asarray(data_sig, dtype=dtype)
+    query_mu = np.asarray(query_mu, dtype=dtype)
+    query_sig = np.asarray(query_sig, dtype=dtype)
+
+    if dtype is not None:
+        ws = np.asarray(ws, dtype=dtype)
+
+    if ne is not None:
+        return ne.evaluate(
+            'sqrt(2 * (ws - (dot - ws * data_mu * query_mu) '
+            '/ (data_sig * query_sig)))',
+            local_dict={
+                'dot': prod,
+                'ws': ws,
+                'data_mu': data_mu,
+                'data_sig': data_sig,
+                'query_mu': query_mu,
+                'query_sig': query_sig,
+            },
+            out=out
+        )
+
+    if out is None:
+        out = np.empty(np.shape(prod), dtype=np.result_type(prod, data_mu,
+            data_sig, query_mu, query_sig))
+    else:
+        # out is written before all of the inputs are read, so any input that
+        # shares memory with it is copied first
+        prod, data_mu, data_sig, query_mu, query_sig = [
+            np.copy(x) if np.may_share_memory(out, x) else x
+            for x in (prod, data_mu, data_sig, query_mu, query_sig)
+        ]
+
+    # 2 * (ws - (prod - ws * data_mu * query_mu) / (data_sig * query_sig))
+    # evaluated in place
+    np.multiply(data_mu, ws, out=out)
+    out *= query_mu
+    np.subtract(prod, out, out=out)
+    out /= data_sig * query_sig
+    np.subtract(ws, out, out=out)
+    out *= 2
 
     with np.errstate(divide='ignore', invalid='ignore'):
-        distance_profile = np.sqrt(np.real(distance_profile))
+        np.sqrt(out, out=out)
 
-    return distance_profile
+    return out
 
 
 def precheck_series_and_query_1d(ts, query):
@@ -577,16 +743,78 @@ def generate_batch_jobs(profile_length, n_jobs):
                 break
 
 
+def generate_batch_jobs_array(profile_length, n_jobs):
+    """
+    Generates the same start and end positions as generate_batch_jobs as
+    contiguous arrays for kernels that iterate over the batches directly.
+
+    Parameters
+    ----------
+    profile_length : int
+        The length of the matrix profile to compute.
+    n_jobs : int
+        The number of jobs (cpu cores).
+    
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray) - The int64 start and end index of each job.
+    """
+    batch_size = max(int(math.ceil(profile_length / n_jobs)), 1)
+    starts = np.arange(0, profile_length, batch_size, dtype=np.int64)
+    ends = np.minimum(starts + batch_size, profile_length)
+
+    return (starts, ends)
+
+
 def apply_exclusion_zone(exclusion_zone, is_join, window_size, data_length,
     index, distance_profile):
     if exclusion_zone > 0 and not is_join:
-        ez_start = np.max([0, index - exclusion_zone])
-        ez_end = np.min([data_length - window_size + 1, index + exclusion_zone + 1])
+        ez_start = max(0, index - exclusion_zone)
+        ez_end = min(data_length - window_size + 1, index + exclusion_zone + 1)
         distance_profile[ez_start:ez_end] = np.inf
 
     return distance_profile
 
 
+def apply_exclusion_zone_batch(exclusion_zone, is_join, window_size,
+    data_length, indices, distance_profiles):
+    """
+    Applies the exclusion zone to a block of distance profiles at once. This
+    avoids a Python level call per index when many distance profiles are
+    computed together.
+
+    Parameters
+    ----------
+    exclusion_zone : int
+        The number of samples to exclude around each index.
+    is_join : bool
+        Flag to indicate if an AB join or self join is occuring.
+    window_size : int
+        The window size.
+    data_length : int
+        The number of elements in the time series.
+    indices : array_like
+        The index of each distance profile.
+    distance_profiles : array_like
+        The 2D float array of distance profiles, one row per index. It is
+        modified in place.
+
+    Returns
+    -------
+    array_like - The distance profiles.
+    """
+    if exclusion_zone > 0 and not is_join:
+        indices = np.asarray(indices, dtype=np.intp)
+        starts = np.maximum(0, indices - exclusion_zone)
+        ends = np.minimum(data_length - window_size + 1,
+            indices + exclusion_zone + 1)
+        ends = np.minimum(ends, np.shape(distance_profiles)[1])
+        cycore.apply_exclusion_zone_batch(distance_profiles, starts, ends)
+
+    return distance_profiles
+
+
 def pearson_to_euclidean(a, windows):
     """
     Converts an array of Pearson metrics to Euclidean. The array and windows
@@ -9,6 +9,12 @@ from __future__ import unicode_literals
 
 
 from libc.math cimport pow
+from libc.math cimport isfinite
+from libc.math cimport isnan
+from libc.math cimport NAN
+from libc.math cimport INFINITY
+from libc.math cimport fabs
+from libc.float cimport DBL_EPSILON
 cdef extern from "math.h":
     double sqrt(double m)
 
@@ -153,4 +159,383 @@ def moving_avg_std(double[:] a, unsigned int w):
         else:
             sig[i] = sqrt(sig_sq[i])
     
-    return (mu, sig)
\ No newline at end of file
+    return (mu, sig)
+
+cdef inline void _two_sum_add(double *p, double *s, double v) nogil:
+    """
+    Adds v to the running sum p while accumulating the rounding error of the
+    addition in s.
+    """
+    cdef double x = p[0] + v
+    cdef double z = x - p[0]
+
+    s[0] = s[0] + ((p[0] - (x - z)) + (v - z))
+    p[0] = x
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def moving_mean(const double[:] a, unsigned int w):
+    """
+    Computes the moving average over the provided array from a compensated
+    rolling sum. Each step adds the sample entering the window and subtracts
+    the one leaving it, so the cost is linear in the length of the array.
+    The window sum is recomputed whenever a nan or inf leaves it.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the moving average on.
+    w : int
+        The window size.
+    
+    Returns
+    -------
+    array_like :
+        The moving average.
+
+    """
+    cdef Py_ssize_t i, j
+    cdef Py_ssize_t n = a.shape[0]
+    cdef Py_ssize_t ws = w
+    cdef Py_ssize_t profile_len = n - w + 1
+    cdef double p = 0
+    cdef double s = 0
+    cdef double[:] mu = np.empty(profile_len, dtype='d')
+
+    for i in range(profile_len):
+        if i == 0 or not isfinite(a[i - 1]):
+            p = 0
+            s = 0
+            for j in range(ws):
+                _two_sum_add(&p, &s, a[i + j])
+        else:
+            _two_sum_add(&p, &s, -a[i - 1])
+            _two_sum_add(&p, &s, a[i + ws - 1])
+
+        # the compensation is nan once an inf enters the window
+        if isfinite(p):
+            mu[i] = (p + s) / ws
+        else:
+            mu[i] = p / ws
+
+    return mu
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef void _two_pass_window(const double[:] a, Py_ssize_t start, Py_ssize_t w,
+    double shift, double *mean, double *m2):
+    """
+    Computes the mean and sum of squared differences of a single window,
+    shifted by the given value, with the two pass algorithm.
+    """
+    cdef Py_ssize_t j
+    cdef double total = 0
+    cdef double delta
+
+    for j in range(w):
+        total = total + (a[start + j] - shift)
+    mean[0] = total / w
+
+    m2[0] = 0
+    for j in range(w):
+        delta = (a[start + j] - shift) - mean[0]
+        m2[0] = m2[0] + delta * delta
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def moving_avg_std_welford(const double[:] a, unsigned int w,
+    bint recomputes=False):
+    """
+    Computes the moving average and standard deviation over the provided
+    array using a rolling form of Welford's method. Each step replaces the
+    sample leaving the window with the one entering it while tracking a bound
+    on the rounding error of the sum of squared differences. The window is
+    recomputed with the two pass algorithm whenever that bound exceeds a
+    small fraction of the sum, for example after a spike or a drop in
+    variance, and whenever a nan or inf leaves it. The samples are shifted
+    by the first value of the last recomputed window so that a large offset
+    does not inflate the error bound.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute statistics on.
+    w : int
+        The window size.
+    recomputes : bool, Default = False
+        Optionally, also return the number of windows that were recomputed
+        with the two pass algorithm.
+    
+    Returns
+    -------
+    (array_like, array_like) :
+        The (mu, sigma) arrays respectively, followed by the number of
+        recomputed windows when requested.
+
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = a.shape[0]
+    cdef Py_ssize_t ws = w
+    cdef Py_ssize_t profile_len = n - w + 1
+    cdef Py_ssize_t n_recomputes = 0
+    cdef double tol = 1e-10
+    cdef double shift = 0
+    cdef double mean = 0
+    cdef double m2 = 0
+    cdef double mean_err = 0
+    cdef double m2_err = 0
+    cdef double old_mean, delta, x_old, x_new, term
+    cdef double[:] mu = np.empty(profile_len, dtype='d')
+    cdef double[:] sig = np.empty(profile_len, dtype='d')
+
+    for i in range(profile_len):
+        if i > 0 and isfinite(a[i - 1]):
+            x_old = a[i - 1] - shift
+            x_new = a[i + ws - 1] - shift
+            delta = x_new - x_old
+            old_mean = mean
+            mean = mean + delta / ws
+            term = delta * (x_new - mean + x_old - old_mean)
+            m2 = m2 + term
+
+            # the error of the mean drifts with every update and feeds into
+            # the sum of squared differences through delta
+            mean_err = mean_err + DBL_EPSILON * (fabs(mean) + fabs(delta) / ws)
+            m2_err = m2_err + DBL_EPSILON * (fabs(m2) + fabs(term)) \
+                + fabs(delta) * (2 * mean_err + DBL_EPSILON * (fabs(x_new)
+                + fabs(x_old) + fabs(mean) + fabs(old_mean)))
+
+        if i == 0 or not isfinite(a[i - 1]) or m2_err > tol * m2:
+            shift = a[i] if isfinite(a[i]) else 0
+            _two_pass_window(a, i, ws, shift, &mean, &m2)
+            mean_err = 0
+            m2_err = 0
+            n_recomputes += 1
+
+        mu[i] = mean + shift
+        if m2 < 0:
+            sig[i] = 0
+        else:
+            sig[i] = sqrt(m2 / ws)
+    
+    if recomputes:
+        return (mu, sig, n_recomputes)
+
+    return (mu, sig)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def find_skip_locations(const double[:] ts, Py_ssize_t profile_len,
+    unsigned int w):
+    """
+    Determines which windows contain nan or inf values. A running count of
+    the non-finite values within the window is maintained so each sample is
+    only inspected when it enters and leaves the window.
+
+    Parameters
+    ----------
+    ts : array_like
+        The time series to inspect.
+    profile_len : int
+        The number of windows to inspect.
+    w : int
+        The window size.
+    
+    Returns
+    -------
+    array_like :
+        The boolean mask of the windows to skip.
+
+    Raises
+    ------
+    ValueError
+        If profile_len exceeds the number of windows in ts.
+
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t ws = w
+    cdef Py_ssize_t count = 0
+
+    if profile_len < 1:
+        return np.zeros(0, dtype=bool)
+
+    if profile_len > ts.shape[0] - ws + 1:
+        raise ValueError('profile_len exceeds the number of windows in ts!')
+
+    skip_loc = np.zeros(profile_len, dtype=bool)
+    cdef np.uint8_t[:] skip = skip_loc.view(np.uint8)
+
+    for i in range(ws):
+        if not isfinite(ts[i]):
+            count += 1
+
+    skip[0] = count > 0
+    for i in range(1, profile_len):
+        if not isfinite(ts[i - 1]):
+            count -= 1
+
+        if not isfinite(ts[i + ws - 1]):
+            count += 1
+
+        skip[i] = count > 0
+
+    return skip_loc
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def apply_exclusion_zone_batch(double[:, :] dp_block, Py_ssize_t[:] starts,
+    Py_ssize_t[:] ends):
+    """
+    Sets the exclusion zone of every row of a block of distance profiles
+    to infinity in place.
+
+    Parameters
+    ----------
+    dp_block : array_like
+        The distance profiles, one row per index.
+    starts : array_like
+        The inclusive start of the exclusion zone for each row.
+    ends : array_like
+        The exclusive end of the exclusion zone for each row. Ends past the
+        width of the block are clipped to it.
+
+    Raises
+    ------
+    ValueError
+        If starts or ends do not have one value per row of dp_block.
+
+    """
+    cdef Py_ssize_t i, j, start, end
+    cdef Py_ssize_t rows = dp_block.shape[0]
+    cdef Py_ssize_t cols = dp_block.shape[1]
+
+    if starts.shape[0] != rows or ends.shape[0] != rows:
+        raise ValueError('starts and ends must have one value per row!')
+
+    with nogil:
+        for i in range(rows):
+            start = max(starts[i], 0)
+            end = min(ends[i], cols)
+            for j in range(start, end):
+                dp_block[i, j] = INFINITY
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def clean_nan_inf(double[:] ts):
+    """
+    Replaces nan and inf values with zeros in place using a single pass
+    over the array.
+
+    Parameters
+    ----------
+    ts : array_like
+        The array to clean.
+
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = ts.shape[0]
+
+    with nogil:
+        for i in range(n):
+            if not isfinite(ts[i]):
+                ts[i] = 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _moving_extreme(const double[:] a, Py_ssize_t w, bint is_max,
+    double[:] out, Py_ssize_t[:] dq) nogil:
+    """
+    Computes the moving min or max with a monotonic queue of indices so that
+    each sample is pushed and popped at most once. Windows containing a nan
+    produce nan.
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = a.shape[0]
+    cdef Py_ssize_t head = 0
+    cdef Py_ssize_t tail = 0
+    cdef Py_ssize_t last_nan = -w
+
+    for i in range(n):
+        if isnan(a[i]):
+            last_nan = i
+        else:
+            if is_max:
+                while tail > head and a[dq[tail - 1]] <= a[i]:
+                    tail -= 1
+            else:
+                while tail > head and a[dq[tail - 1]] >= a[i]:
+                    tail -= 1
+
+            dq[tail] = i
+            tail += 1
+
+        while tail > head and dq[head] <= i - w:
+            head += 1
+
+        if i >= w - 1:
+            if last_nan > i - w:
+                out[i - w + 1] = NAN
+            else:
+                out[i - w + 1] = a[dq[head]]
+
+
+def moving_min(const double[:] a, unsigned int w):
+    """
+    Computes the moving minimum over the provided array using explicit
+    indexing instead of a strided view.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the moving minimum on.
+    w : int
+        The window size.
+    
+    Returns
+    -------
+    array_like :
+        The array of moving minimums.
+
+    """
+    cdef double[:] out = np.empty(a.shape[0] - w + 1, dtype='d')
+    cdef Py_ssize_t[:] dq = np.empty(a.shape[0], dtype=np.intp)
+
+    _moving_extreme(a, w, False, out, dq)
+
+    return out
+
+
+def moving_max(const double[:] a, unsigned int w):
+    """
+    Computes the moving maximum over the provided array using explicit
+    indexing instead of a strided view.
+
+    Parameters
+    ----------
+    a : array_like
+        The array to compute the moving maximum on.
+    w : int
+        The window size.
+    
+    Returns
+    -------
+    array_like :
+        The array of moving maximums.
+
+    """
+    cdef double[:] out = np.empty(a.shape[0] - w + 1, dtype='d')
+    cdef Py_ssize_t[:] dq = np.empty(a.shape[0], dtype=np.intp)
+
+    _moving_extreme(a, w, True, out, dq)
+
+    return out
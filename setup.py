@@ -8,7 +8,7 @@ from distutils.extension import Extension
 from Cython.Build import cythonize
 import numpy
 
-import os, sys
+import os
 from glob import glob
 
 import version
@@ -25,6 +25,14 @@ extensions.append(Extension(
     include_dirs=[numpy.get_include()],
 ))
 
+extensions.append(Extension(
+    'matrixprofile.algorithms.cystomp',
+    ['matrixprofile/algorithms/cystomp.pyx'],
+    extra_compile_args = ["-O2", "-fopenmp" ],
+    extra_link_args = ['-fopenmp'],
+    include_dirs=[numpy.get_include()],
+))
+
 extensions.append(Extension(
     'matrixprofile.cycore',
     ['matrixprofile/cycore.pyx'],
@@ -33,15 +41,9 @@ extensions.append(Extension(
 ))
 
 matplot = 'matplotlib>=3.0.3'
-scipy = 'scipy>=1.3.2,<2.0.0'
-if sys.version_info.major == 3:
-    with open('README.rst', 'r', encoding='utf-8') as fh:
-        long_description = fh.read()
-elif sys.version_info.major == 2:
-    matplot = 'matplotlib'
-    scipy = 'scipy<2.0.0'
-    with open('README.rst', 'r') as fh:
-        long_description = fh.read()
+scipy = 'scipy>=1.4.0,<2.0.0'
+with open('README.rst', 'r', encoding='utf-8') as fh:
+    long_description = fh.read()
 
 # copy version file over
 src_path = os.path.dirname(os.path.abspath(__file__))
@@ -63,12 +65,13 @@ setuptools.setup(
         'Source Code': SOURCE_URL,
     },
     packages = setuptools.find_packages(),
+    python_requires='>=3.5',
     setup_requires=['cython>=0.x', 'wheel'],
     install_requires=['numpy>=1.16.2', matplot, 'protobuf==3.11.2', scipy],
+    extras_require={'fast': ['numexpr>=2.6.8']},
     ext_modules=cythonize(extensions),
     include_dirs=[numpy.get_include()],
     classifiers=[
-        "Programming Language :: Python :: 2",
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: Apache Software License",
         "Intended Audience :: Science/Research",
@@ -15,6 +15,7 @@ import pytest
 
 import numpy as np
 
+from matrixprofile import core
 from matrixprofile import transform
 from matrixprofile import compute
 from matrixprofile import io
@@ -128,6 +129,18 @@ def test_meanstd_valid():
         np.testing.assert_almost_equal(av, expect[i])
 
 
+def test_meanstd_spike():
+    ts = np.sin(np.linspace(0, 50, 20000)) * 1e-2
+    ts[5000:5100] += 1e4
+    w = 100
+
+    std = np.std(core.rolling_window(ts, w), axis=1)
+    expect = (std < np.mean(std)).astype('d')
+    av = transform.make_meanstd_av(ts, w)
+
+    np.testing.assert_equal(av, expect)
+
+
 def test_clipping_valid():
     ts_arr = [[3., 3., 3., 3., 3., 3.],
               [0., 1., 2., 3., 4., 5.],
@@ -17,6 +17,7 @@ import pytest
 import numpy as np
 
 from matrixprofile import core
+from matrixprofile import cycore
 
 
 def test_is_array_like_invalid():
@@ -163,6 +164,26 @@ def test_moving_std():
     np.testing.assert_almost_equal(actual, desired)
 
 
+def test_moving_average_std_spike():
+    a = np.sin(np.linspace(0, 50, 20000)) * 1e-2
+    a[5000:5100] += 1e4
+    windows = core.rolling_window(a, 100)
+
+    np.testing.assert_allclose(
+        core.moving_average(a, 100), windows.mean(axis=1), rtol=1e-9)
+    np.testing.assert_allclose(
+        core.moving_std(a, 100), windows.std(axis=1), rtol=1e-9)
+
+
+def test_moving_average_std_2d():
+    a = np.arange(12.).reshape(3, 4)
+    windows = core.rolling_window(a, 2)
+
+    np.testing.assert_equal(core.moving_average(a, 2), windows.mean(-1))
+    np.testing.assert_equal(core.moving_std(a, 2), windows.std(-1))
+    assert(core.moving_average(a, 2).shape == (3, 3))
+
+
 def test_moving_avg_std():
     a = np.array([1, 2, 3, 4, 5, 6])
     mu, std = core.moving_avg_std(a, 3)
@@ -183,6 +204,53 @@ def test_fft_convolve():
     np.testing.assert_almost_equal(dp, dp_desired)
 
 
+def test_fft_convolve_float32():
+    query = np.array([1, 2, 3, 4], dtype=np.float32)
+    ts = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20], dtype=np.float32)
+
+    dp = core.fft_convolve(ts, query)
+    dp_desired = np.array([36, 28, 26, 46, 68, 50, 57, 64, 99, 148])
+
+    assert(dp.dtype == np.float32)
+    np.testing.assert_almost_equal(dp, dp_desired, decimal=4)
+
+
+def test_fft_convolve_complex():
+    query = np.array([1, 2, 3, 4])
+    ts = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20]) + 2j
+    dp_desired = np.array([36, 28, 26, 46, 68, 50, 57, 64, 99, 148])
+
+    dp = core.fft_convolve(ts, query)
+
+    assert(not np.iscomplexobj(dp))
+    np.testing.assert_almost_equal(dp, dp_desired)
+
+
+def test_fft_convolve_reuses_query_spectrum():
+    query = np.array([1, 2, 3, 4])
+    ts = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20])
+    dp_desired = np.array([36, 28, 26, 46, 68, 50, 57, 64, 99, 148])
+
+    core._fft_reversed_query.cache_clear()
+    core.fft_convolve(ts, query)
+    dp = core.fft_convolve(ts, query.copy())
+
+    np.testing.assert_almost_equal(dp, dp_desired)
+    assert(core._fft_reversed_query.cache_info().hits == 1)
+
+
+def test_fft_convolve_skips_cache_for_long_transforms():
+    np.random.seed(9999)
+    ts = np.random.uniform(size=core.FFT_CACHE_MAX_LENGTH + 1)
+    query = np.random.uniform(size=8)
+
+    core._fft_reversed_query.cache_clear()
+    dp = core.fft_convolve(ts, query)
+
+    np.testing.assert_almost_equal(dp, np.correlate(ts, query, mode='valid'))
+    assert(core._fft_reversed_query.cache_info().currsize == 0)
+
+
 def test_sliding_dot_product():
     query = np.array([1, 2, 3, 4])
     ts = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20])
@@ -193,6 +261,120 @@ def test_sliding_dot_product():
     np.testing.assert_almost_equal(dp, dp_desired)
 
 
+def test_sliding_dot_product_query_longer_than_ts():
+    query = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20])
+    ts = np.array([1, 2, 3, 4])
+
+    dp = core.sliding_dot_product(ts, query)
+
+    assert(len(dp) == 0)
+
+
+def test_sliding_dot_product_long_query():
+    np.random.seed(9999)
+    ts = np.random.uniform(size=4096)
+    query = ts[100:100 + core.FFT_CONVOLVE_MIN_QUERY_LENGTH]
+
+    dp = core.sliding_dot_product(ts, query)
+    dp_desired = np.convolve(ts, np.flipud(query), mode='valid')
+
+    np.testing.assert_almost_equal(dp, dp_desired)
+
+
+DISTANCE_PROFILE_TS = np.array([4, 5, 6, 1, 2, 3, 8, 9, 1, 7, 8, 15, 20],
+    dtype='d')
+DISTANCE_PROFILE_QUERY = np.array([1, 2, 3, 5], dtype='d')
+DISTANCE_PROFILE_BACKENDS = ['numexpr', 'numpy']
+
+
+@pytest.fixture
+def distance_profile_args(backend, monkeypatch):
+    """
+    Selects the distance_profile backend and returns the arguments for the
+    distance profile of DISTANCE_PROFILE_QUERY over DISTANCE_PROFILE_TS.
+    """
+    if backend == 'numexpr':
+        pytest.importorskip('numexpr')
+        assert(core.ne is not None)
+    else:
+        monkeypatch.setattr(core, 'ne', None)
+
+    w = len(DISTANCE_PROFILE_QUERY)
+    prod = core.sliding_dot_product(DISTANCE_PROFILE_TS,
+        DISTANCE_PROFILE_QUERY)
+    data_mu, data_sig = core.moving_avg_std(DISTANCE_PROFILE_TS, w)
+    query_mu, query_sig = core.moving_avg_std(DISTANCE_PROFILE_QUERY, w)
+
+    return prod, w, data_mu, data_sig, query_mu, query_sig
+
+
+@pytest.mark.parametrize('backend', DISTANCE_PROFILE_BACKENDS)
+def test_distance_profile(distance_profile_args):
+    ts = DISTANCE_PROFILE_TS
+    query = DISTANCE_PROFILE_QUERY
+    prod, w, data_mu, data_sig, query_mu, query_sig = distance_profile_args
+
+    desired = np.array([
+        np.sqrt(np.sum(((ts[i:i + w] - data_mu[i]) / data_sig[i]
+            - (query - query_mu) / query_sig) ** 2))
+        for i in range(len(ts) - w + 1)
+    ])
+    actual = core.distance_profile(*distance_profile_args)
+
+    np.testing.assert_almost_equal(actual, desired)
+
+
+@pytest.mark.parametrize('backend', DISTANCE_PROFILE_BACKENDS)
+def test_distance_profile_memoryviews(distance_profile_args):
+    prod, w, data_mu, data_sig, query_mu, query_sig = distance_profile_args
+    ts_mu, ts_sig = cycore.moving_avg_std(DISTANCE_PROFILE_TS, w)
+
+    desired = core.distance_profile(*distance_profile_args)
+    actual = core.distance_profile(prod, w, ts_mu, ts_sig, query_mu,
+        query_sig)
+
+    np.testing.assert_almost_equal(actual, desired)
+
+
+@pytest.mark.parametrize('backend', DISTANCE_PROFILE_BACKENDS)
+def test_distance_profile_out(distance_profile_args):
+    desired = core.distance_profile(*distance_profile_args)
+    out = np.empty(len(desired))
+    actual = core.distance_profile(*distance_profile_args, out=out)
+
+    assert(actual is out)
+    np.testing.assert_almost_equal(actual, desired)
+
+
+@pytest.mark.parametrize('backend', DISTANCE_PROFILE_BACKENDS)
+def test_distance_profile_out_aliased(distance_profile_args):
+    prod, w, data_mu, data_sig, query_mu, query_sig = distance_profile_args
+    desired = core.distance_profile(*distance_profile_args)
+
+    aliased = np.copy(prod)
+    actual = core.distance_profile(aliased, w, data_mu, data_sig, query_mu,
+        query_sig, out=aliased)
+
+    assert(actual is aliased)
+    np.testing.assert_almost_equal(actual, desired)
+
+    aliased = np.copy(data_sig)
+    actual = core.distance_profile(prod, w, data_mu, aliased, query_mu,
+        query_sig, out=aliased)
+
+    assert(actual is aliased)
+    np.testing.assert_almost_equal(actual, desired)
+
+
+@pytest.mark.parametrize('backend', DISTANCE_PROFILE_BACKENDS)
+def test_distance_profile_float32(distance_profile_args):
+    desired = core.distance_profile(*distance_profile_args)
+    actual = core.distance_profile(*distance_profile_args, dtype=np.float32)
+
+    assert(actual.dtype == np.float32)
+    np.testing.assert_almost_equal(actual, desired, decimal=5)
+
+
 def test_generate_batch_jobs_single_job():
     profile_length = 9
     n_jobs = 1
@@ -223,6 +405,59 @@ def test_generate_batch_jobs_multiple_jobs():
     np.testing.assert_equal(actual, desired)
 
 
+def test_generate_batch_jobs_array():
+    for profile_length, n_jobs in ((9, 1), (9, 12), (9, 4)):
+        desired = list(core.generate_batch_jobs(profile_length, n_jobs))
+        starts, ends = core.generate_batch_jobs_array(profile_length, n_jobs)
+
+        assert(starts.dtype == np.int64)
+        assert(ends.dtype == np.int64)
+        np.testing.assert_equal(list(zip(starts, ends)), desired)
+
+
+def test_apply_exclusion_zone_batch():
+    window_size = 4
+    data_length = 12
+    profile_length = data_length - window_size + 1
+    indices = np.array([0, 4, 8])
+    distance_profiles = np.zeros((len(indices), profile_length))
+
+    desired = np.zeros((len(indices), profile_length))
+    for row, index in enumerate(indices):
+        core.apply_exclusion_zone(2, False, window_size, data_length, index,
+            desired[row])
+
+    actual = core.apply_exclusion_zone_batch(2, False, window_size,
+        data_length, indices, distance_profiles)
+
+    np.testing.assert_equal(actual, desired)
+    np.testing.assert_equal(distance_profiles, desired)
+
+    distance_profiles = np.zeros((len(indices), profile_length))
+    actual = core.apply_exclusion_zone_batch(2, True, window_size,
+        data_length, indices, distance_profiles)
+
+    np.testing.assert_equal(actual, np.zeros((len(indices), profile_length)))
+
+
+def test_apply_exclusion_zone_batch_narrow_block():
+    window_size = 4
+    data_length = 12
+    indices = np.array([3])
+    parent = np.zeros((2, 10))
+    distance_profiles = parent[:1, :5]
+
+    desired = np.zeros(5)
+    core.apply_exclusion_zone(2, False, window_size, data_length, 3, desired)
+
+    core.apply_exclusion_zone_batch(2, False, window_size, data_length,
+        indices, distance_profiles)
+
+    np.testing.assert_equal(distance_profiles[0], desired)
+    np.testing.assert_equal(parent[0, 5:], np.zeros(5))
+    np.testing.assert_equal(parent[1], np.zeros(10))
+
+
 def test_is_nan_inf():
     assert(core.is_nan_inf(np.inf) == True)
     assert(core.is_nan_inf(np.nan) == True)
@@ -326,6 +561,35 @@ def test_moving_min():
     np.testing.assert_equal(desired, actual)
 
 
+def test_moving_statistics_read_only():
+    a = np.array([1, 0, 1, 2, 0, 2], dtype='d')
+    a.setflags(write=False)
+    windows = core.rolling_window(a, 4)
+
+    np.testing.assert_almost_equal(core.moving_average(a, 4),
+        windows.mean(axis=1))
+    np.testing.assert_almost_equal(core.moving_std(a, 4), windows.std(axis=1))
+    np.testing.assert_equal(core.moving_min(a, 4), windows.min(axis=1))
+    np.testing.assert_equal(core.moving_max(a, 4), windows.max(axis=1))
+
+
+def test_moving_min_max_dtype_and_shape():
+    for dtype in ('int32', 'int64', 'float32', 'uint8'):
+        a = np.array([1, 0, 1, 2, 0, 2], dtype=dtype)
+        windows = core.rolling_window(a, 4)
+
+        for actual, desired in ((core.moving_min(a, 4), windows.min(axis=1)),
+                (core.moving_max(a, 4), windows.max(axis=1))):
+            assert(actual.dtype == desired.dtype)
+            np.testing.assert_equal(actual, desired)
+
+    a = np.arange(12.).reshape(3, 4)
+    windows = core.rolling_window(a, 2)
+
+    np.testing.assert_equal(core.moving_min(a, 2), windows.min(axis=1))
+    np.testing.assert_equal(core.moving_max(a, 2), windows.max(axis=1))
+
+
 def test_moving_max():
     a = np.array([1, 1, 1, 2, 0, 2])
     desired = np.array([2, 2, 2])
@@ -16,6 +16,7 @@ import pytest
 
 import numpy as np
 
+from matrixprofile import core
 from matrixprofile import cycore
 import matrixprofile
 
@@ -67,4 +68,142 @@ def test_muinvn_vs_matlab():
     mu, std = cycore.muinvn(ts, w)
 
     np.testing.assert_almost_equal(ml_mu, mu, decimal=4)
-    np.testing.assert_almost_equal(ml_std, std, decimal=4)
\ No newline at end of file
+    np.testing.assert_almost_equal(ml_std, std, decimal=4)
+
+def test_find_skip_locations():
+    a = np.array([1, np.inf, 3, 4, 5, 6, 7, np.nan], dtype='d')
+    desired = np.array([True, True, False, False, True])
+    actual = cycore.find_skip_locations(a, 5, 4)
+
+    np.testing.assert_equal(actual, desired)
+
+
+def test_find_skip_locations_read_only():
+    a = np.array([1, np.inf, 3, 4, 5, 6, 7, np.nan], dtype='d')
+    a.setflags(write=False)
+    desired = np.array([True, True, False, False, True])
+    actual = cycore.find_skip_locations(a, 5, 4)
+
+    np.testing.assert_equal(actual, desired)
+
+
+def test_find_skip_locations_invalid_profile_len():
+    a = np.arange(8, dtype='d')
+
+    with pytest.raises(ValueError) as excinfo:
+        cycore.find_skip_locations(a, 6, 4)
+    assert 'profile_len exceeds the number of windows' in str(excinfo.value)
+
+
+def test_find_skip_locations_no_windows():
+    a = np.arange(3, dtype='d')
+
+    for profile_len in (0, -1):
+        actual = cycore.find_skip_locations(a, profile_len, 4)
+
+        assert(actual.dtype == bool)
+        assert(len(actual) == 0)
+
+
+def test_moving_avg_std_welford():
+    np.random.seed(9999)
+    a = np.random.uniform(size=10000) + 1e6
+    a[5000] = np.nan
+    w = 32
+    windows = core.rolling_window(a, w)
+    mu, std = cycore.moving_avg_std_welford(a, w)
+
+    np.testing.assert_almost_equal(mu, windows.mean(axis=1))
+    np.testing.assert_almost_equal(std, windows.std(axis=1))
+
+
+def test_moving_avg_std_welford_spike():
+    a = np.sin(np.linspace(0, 50, 20000)) * 1e-2
+    a[5000:5100] += 1e4
+    w = 100
+    windows = core.rolling_window(a, w)
+    mu, std = cycore.moving_avg_std_welford(a, w)
+
+    np.testing.assert_allclose(mu, windows.mean(axis=1), rtol=1e-9)
+    np.testing.assert_allclose(std, windows.std(axis=1), rtol=1e-9)
+
+
+def test_moving_avg_std_welford_variance_step():
+    np.random.seed(9999)
+    a = np.concatenate([
+        np.random.uniform(size=10000) * 1000,
+        np.random.uniform(size=10000) * 1e-3
+    ])
+    w = 100
+
+    for offset in (0, 1e6):
+        windows = core.rolling_window(a + offset, w)
+        mu, std = cycore.moving_avg_std_welford(a + offset, w)
+
+        np.testing.assert_allclose(mu, windows.mean(axis=1), rtol=1e-9)
+        np.testing.assert_allclose(std, windows.std(axis=1), rtol=1e-9)
+
+
+def test_moving_avg_std_welford_read_only():
+    a = np.array([1, 2, 3, 4, 5, 6], dtype='d')
+    a.setflags(write=False)
+    mu, std = cycore.moving_avg_std_welford(a, 3)
+
+    np.testing.assert_almost_equal(mu, [2, 3, 4, 5])
+    np.testing.assert_almost_equal(std, np.full(4, np.sqrt(2 / 3)))
+
+
+def test_moving_avg_std_welford_offset_recomputes():
+    np.random.seed(9999)
+    a = np.random.normal(size=100000) + 1e8
+    w = 100
+    windows = core.rolling_window(a, w)
+    mu, std, recomputes = cycore.moving_avg_std_welford(a, w, True)
+
+    np.testing.assert_allclose(mu, windows.mean(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(std, windows.std(axis=1), rtol=1e-6)
+    assert(recomputes < len(mu) / 100)
+
+
+def test_moving_mean():
+    np.random.seed(9999)
+    a = np.random.normal(size=10000) + 1e8
+    a[5000] = np.nan
+    a[7000] = np.inf
+    w = 32
+    windows = core.rolling_window(a, w)
+
+    np.testing.assert_allclose(cycore.moving_mean(a, w),
+        windows.mean(axis=1), rtol=1e-14)
+
+
+def test_moving_mean_read_only():
+    a = np.array([1, 2, 3, 4, 5, 6], dtype='d')
+    a.setflags(write=False)
+
+    np.testing.assert_equal(np.asarray(cycore.moving_mean(a, 3)), [2, 3, 4, 5])
+
+
+def test_apply_exclusion_zone_batch_row_mismatch():
+    with pytest.raises(ValueError) as excinfo:
+        cycore.apply_exclusion_zone_batch(np.zeros((2, 5)),
+            np.zeros(1, dtype=np.intp), np.zeros(1, dtype=np.intp))
+    assert 'one value per row' in str(excinfo.value)
+
+
+def test_clean_nan_inf():
+    a = np.array([np.nan, 1, np.inf, 2, -np.inf], dtype='d')
+    cycore.clean_nan_inf(a)
+
+    np.testing.assert_equal(a, np.array([0, 1, 0, 2, 0]))
+
+
+def test_moving_min_max():
+    np.random.seed(9999)
+    a = np.random.uniform(size=1000)
+    a[[10, 500]] = np.nan
+    w = 16
+    windows = core.rolling_window(a, w)
+
+    np.testing.assert_equal(cycore.moving_min(a, w), np.min(windows, axis=1))
+    np.testing.assert_equal(cycore.moving_max(a, w), np.max(windows, axis=1))
@@ -80,3 +80,61 @@ def test_stomp_small_series_self_join_multi_threaded():
     np.testing.assert_almost_equal(profile['rmp'], desired_rmp)
     np.testing.assert_almost_equal(profile['rpi'], desired_rpi)
 
+
+
+def test_stomp_similarity_join_batches_match_single_threaded():
+    np.random.seed(9999)
+    ts = np.random.uniform(size=1024)
+    query = np.random.uniform(size=256)
+    w = 32
+
+    single = stomp(ts, w, query=query, n_jobs=1)
+    multi = stomp(ts, w, query=query, n_jobs=4)
+
+    np.testing.assert_almost_equal(single['mp'], multi['mp'])
+    np.testing.assert_equal(single['pi'], multi['pi'])
+    assert(np.max(single['pi']) <= len(query) - w)
+
+
+def brute_force_join(ts, query, w):
+    def znorm(windows):
+        mu = windows.mean(axis=1, keepdims=True)
+        sig = windows.std(axis=1, keepdims=True)
+        return (windows - mu) / sig
+
+    ts_windows = znorm(np.array(
+        [ts[i:i + w] for i in range(len(ts) - w + 1)]))
+    query_windows = znorm(np.array(
+        [query[i:i + w] for i in range(len(query) - w + 1)]))
+    distances = np.sqrt(np.sum(
+        (ts_windows[:, None, :] - query_windows[None, :, :]) ** 2, axis=2))
+
+    return np.min(distances, axis=1), np.argmin(distances, axis=1)
+
+
+def test_stomp_similarity_join_matches_brute_force():
+    np.random.seed(9999)
+    ts = np.random.uniform(size=200)
+    query = np.random.uniform(size=150)
+    w = 16
+    mp, pi = brute_force_join(ts, query, w)
+
+    for n_jobs in (1, 3):
+        profile = stomp(ts, w, query=query, n_jobs=n_jobs)
+
+        np.testing.assert_almost_equal(profile['mp'], mp)
+        np.testing.assert_equal(profile['pi'], pi)
+
+
+def test_stomp_query_longer_than_ts():
+    np.random.seed(9999)
+    ts = np.random.uniform(size=120)
+    query = np.random.uniform(size=180)
+    w = 16
+    mp, pi = brute_force_join(ts, query, w)
+
+    for n_jobs in (1, 3):
+        profile = stomp(ts, w, query=query, n_jobs=n_jobs)
+
+        np.testing.assert_almost_equal(profile['mp'], mp)
+        np.testing.assert_equal(profile['pi'], pi)